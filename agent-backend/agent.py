@@ -1,14 +1,24 @@
-import json
+import asyncio
+import hashlib
 import logging
 import os
+import re
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+import httpx
+import numpy as np
+import orjson
 from openai import AsyncAzureOpenAI
 from dotenv import load_dotenv
 
+import semantic_cache
+from llm_cache import cached_create
 from models import MessageModel
 from prompts import SYSTEM_PROMPT
-from tools import TOOL_LIST, execute_get_current_weather
+from tools import TOOL_LIST_FROZEN, execute_get_current_weather
 
 # Load .env from project root (one level above agent-backend/)
 load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
@@ -17,7 +27,47 @@ PROJECT_ENDPOINT = os.getenv("PROJECT_ENDPOINT", "")
 AZURE_AI_API_KEY = os.getenv("AZURE_AI_API_KEY", "")
 AZURE_API_VERSION = os.getenv("AZURE_API_VERSION", "2025-01-01-preview")
 MODEL_DEPLOYMENT_NAME = os.getenv("MODEL_DEPLOYMENT_NAME", "")
+# Optional: enables the semantic reply cache for history-free queries
+EMBEDDING_DEPLOYMENT_NAME = os.getenv("EMBEDDING_DEPLOYMENT_NAME", "")
+# Optional: send prompt_cache_key so the provider reuses the cached system-prompt prefix
+PROMPT_CACHE_KEY_ENABLED = os.getenv("PROMPT_CACHE_KEY_ENABLED", "false").lower() == "true"
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8000")
+# Concurrent completion calls allowed, and how many more may wait before /chat sheds load
+AGENT_MAX_INFLIGHT = int(os.getenv("AGENT_MAX_INFLIGHT", "64"))
+AGENT_MAX_QUEUED = int(os.getenv("AGENT_MAX_QUEUED", "64"))
+
+# Cheap guess at the location named in a query, used to prefetch weather speculatively
+_LOCATION_RE = re.compile(r"\bin ([A-Z][a-z]+(?: [A-Z][a-z]+)*)\b")
+
+# Whole-message match for plain "weather in <Place>" queries, answered in a single round
+_FAST_PATH_RE = re.compile(
+    r"^\s*(?i:(?:what(?:'s| is) the |how(?:'s| is) the )?weather(?: like)? in) "
+    r"([A-Z][a-z]+(?: [A-Z][a-z]+)*)\s*[?.!]?\s*$"
+)
+_FAST_PATH_MAX_LOCATION_LEN = 40
+
+# Long sessions keep only the most recent turns plus a one-line summary of the rest
+_HISTORY_COMPACT_THRESHOLD = 12
+_HISTORY_KEEP_TURNS = 10
+_SUMMARY_MAX_LOCATIONS = 5
+
+# Streamed deltas are coalesced into one SSE token event per window
+_TOKEN_FLUSH_SECONDS = 0.02
+
+# Fixed stream events, shared across requests so the server can pre-encode their frames
+STATUS_ANALYZING = {"type": "status", "message": "Analyzing your question..."}
+STATUS_GENERATING = {"type": "status", "message": "Generating response..."}
+ERROR_LLM_UNAVAILABLE = {"type": "error", "message": "The weather service is currently unavailable. Please try again."}
+ERROR_EMPTY_REPLY = {"type": "error", "message": "The model returned an empty response. Please try again."}
+ERROR_BAD_TOOL_ARGS = {"type": "error", "message": "I encountered an issue parsing the request. Could you rephrase it?"}
+STATIC_EVENTS = (STATUS_ANALYZING, STATUS_GENERATING, ERROR_LLM_UNAVAILABLE, ERROR_EMPTY_REPLY, ERROR_BAD_TOOL_ARGS)
+
+# Shared by every request's message list — never mutate it
+_SYSTEM_MSG: dict = {"role": "system", "content": SYSTEM_PROMPT}
+_PROMPT_CACHE_KEY = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:32]
+
+_LLM_SEM = asyncio.Semaphore(AGENT_MAX_INFLIGHT)
+_llm_waiting = 0
 
 logger = logging.getLogger(__name__)
 
@@ -27,22 +77,233 @@ class AgentError(Exception):
 
 
 def _make_chat_client() -> AsyncAzureOpenAI:
+    # One long-lived HTTP/2 pool shared by every request; closed with the chat client
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=200,
+            max_keepalive_connections=100,
+            keepalive_expiry=300.0,
+        ),
+        timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+    )
     return AsyncAzureOpenAI(
         azure_endpoint=PROJECT_ENDPOINT,
         api_key=AZURE_AI_API_KEY,
         api_version=AZURE_API_VERSION,
+        http_client=http_client,
     )
 
 
+def _summarize_turns(turns: list[dict]) -> dict:
+    queries = [t["content"] for t in turns if t["role"] == "user"]
+    # History is client-supplied, so only short captures make it into the system message
+    locations = dict.fromkeys(
+        m.group(1)
+        for q in queries
+        for m in _LOCATION_RE.finditer(q)
+        if len(m.group(1)) <= _FAST_PATH_MAX_LOCATION_LEN
+    )
+    summary = f"Earlier chat summary: {len(queries)} user queries"
+    if locations:
+        summary += f" about weather in {', '.join(list(locations)[:_SUMMARY_MAX_LOCATIONS])}"
+    return {"role": "system", "content": summary + "."}
+
+
+def llm_overloaded() -> bool:
+    """True when every completion slot is busy and the wait queue is full."""
+    return _LLM_SEM.locked() and _llm_waiting >= AGENT_MAX_QUEUED
+
+
+@asynccontextmanager
+async def _llm_slot():
+    global _llm_waiting
+    _llm_waiting += 1
+    try:
+        await _LLM_SEM.acquire()
+    finally:
+        _llm_waiting -= 1
+    try:
+        yield
+    finally:
+        _LLM_SEM.release()
+
+
+async def _create(chat_client: AsyncAzureOpenAI, **kwargs):
+    if PROMPT_CACHE_KEY_ENABLED:
+        # Every call starts with the same system prompt; route them to one prefix cache
+        kwargs["prompt_cache_key"] = _PROMPT_CACHE_KEY
+    async with _llm_slot():
+        return await cached_create(chat_client, **kwargs)
+
+
 def _build_messages(history: list[MessageModel], message: str) -> list[dict]:
-    messages: list[dict] = [{"role": "system", "content": SYSTEM_PROMPT}]
-    for msg in history:
-        if msg.role == "system":
-            logger.warning("Skipping system role message from history to prevent injection.")
+    turns = [{"role": msg.role, "content": msg.content} for msg in history if msg.role != "system"]
+    if len(turns) != len(history):
+        logger.warning(
+            "Skipped %d system role message(s) from history to prevent injection.",
+            len(history) - len(turns),
+        )
+    if len(turns) > _HISTORY_COMPACT_THRESHOLD:
+        older, turns = turns[:-_HISTORY_KEEP_TURNS], turns[-_HISTORY_KEEP_TURNS:]
+        return [_SYSTEM_MSG, _summarize_turns(older), *turns, {"role": "user", "content": message}]
+    return [_SYSTEM_MSG, *turns, {"role": "user", "content": message}]
+
+
+def _query_location(message: str) -> str | None:
+    """Casefolded location named in a query, used to scope semantic-cache entries."""
+    match = _LOCATION_RE.search(message)
+    if match is None or len(match.group(1)) > _FAST_PATH_MAX_LOCATION_LEN:
+        return None
+    return match.group(1).casefold()
+
+
+async def _embed_query(
+    chat_client: AsyncAzureOpenAI, history: list[MessageModel], message: str
+) -> tuple[np.ndarray, str] | None:
+    """Return the (embedding, location) semantic-cache key, or None to bypass the cache."""
+    # Replies that depend on earlier turns must never be served to other sessions
+    if history or not EMBEDDING_DEPLOYMENT_NAME:
+        return None
+    # Without a location a near-duplicate embedding could belong to another city's question
+    location = _query_location(message)
+    if location is None:
+        return None
+    vec = await semantic_cache.embed(chat_client, EMBEDDING_DEPLOYMENT_NAME, message)
+    if vec is None:
+        return None
+    return vec, location
+
+
+def _try_fast_path(message: str) -> str | None:
+    """Return the location when the query unambiguously asks for its weather."""
+    match = _FAST_PATH_RE.match(message)
+    if match is None or len(match.group(1)) > _FAST_PATH_MAX_LOCATION_LEN:
+        return None
+    return match.group(1)
+
+
+def _inject_weather(messages: list[dict], location: str, result: str) -> None:
+    # Stands in for the round-1 tool call so a single completion can answer
+    messages.append({"role": "system", "content": f"Weather data for {location}: {result}"})
+
+
+def _parse_tool_location(tool_call) -> str | None:
+    """Return the location argument of a tool call, or None if it is malformed."""
+    try:
+        args = orjson.loads(tool_call.function.arguments)
+        location = args["location"]
+        if not isinstance(location, str) or not location:
+            raise ValueError("location must be a non-empty string")
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as exc:
+        logger.error(
+            "Malformed tool arguments: %r — %s",
+            tool_call.function.arguments,
+            exc,
+        )
+        return None
+    return location
+
+
+def _start_prefetch(
+    message: str,
+    mcp_url: str,
+    mcp_client: httpx.AsyncClient | None,
+) -> tuple[str, asyncio.Task] | None:
+    """Start fetching weather for the guessed location while round 1 is in flight."""
+    match = _LOCATION_RE.search(message)
+    if match is None:
+        return None
+    guess = match.group(1)
+    return guess, asyncio.create_task(execute_get_current_weather(guess, mcp_url, mcp_client))
+
+
+def _cancel_prefetch(prefetch: tuple[str, asyncio.Task] | None) -> None:
+    if prefetch is not None:
+        prefetch[1].cancel()
+
+
+def _weather_ok(result: str) -> bool:
+    """True if an MCP result is weather data rather than an {"error": ...} payload."""
+    try:
+        body = orjson.loads(result)
+    except orjson.JSONDecodeError:
+        return False
+    return not (isinstance(body, dict) and "error" in body)
+
+
+async def _fetch_weather(
+    location: str,
+    mcp_url: str,
+    mcp_client: httpx.AsyncClient | None,
+    prefetch: tuple[str, asyncio.Task] | None = None,
+) -> tuple[str, bool]:
+    """Return the MCP result and whether it is real data; replies built on errors are not cached."""
+    if prefetch is not None:
+        guess, task = prefetch
+        if guess.casefold() == location.strip().casefold():
+            logger.info("Speculative prefetch hit: location=%r", location)
+            result = await task
+            return result, _weather_ok(result)
+        task.cancel()
+    result = await execute_get_current_weather(location, mcp_url, mcp_client)
+    return result, _weather_ok(result)
+
+
+def _open_stream(chat_client: AsyncAzureOpenAI, messages: list) -> asyncio.Task:
+    """Start the reply-producing completion in the background; callers cancel it on exit."""
+    return asyncio.create_task(_create(
+        chat_client,
+        model=MODEL_DEPLOYMENT_NAME,
+        messages=messages,
+        temperature=0.2,
+        stream=True,
+    ))
+
+
+async def _close_stream_task(stream_task: asyncio.Task) -> None:
+    """Cancel a pending stream request, or close a stream that opened but was never consumed."""
+    stream_task.cancel()
+    if stream_task.done() and not stream_task.cancelled() and stream_task.exception() is None:
+        await stream_task.result().close()
+
+
+async def _batched_deltas(stream) -> AsyncIterator[str]:
+    """Yield streamed completion text batched per flush window."""
+    pending: list[str] = []
+    last_flush = time.monotonic()
+    async for chunk in stream:
+        # Azure prepends a content-filter chunk that carries no choices
+        if not chunk.choices:
             continue
-        messages.append({"role": msg.role, "content": msg.content})
-    messages.append({"role": "user", "content": message})
-    return messages
+        delta = chunk.choices[0].delta.content
+        if delta:
+            pending.append(delta)
+        if pending and time.monotonic() - last_flush >= _TOKEN_FLUSH_SECONDS:
+            yield "".join(pending)
+            pending.clear()
+            last_flush = time.monotonic()
+    if pending:
+        yield "".join(pending)
+
+
+def _finalize_reply(
+    reply_content: str | None, tool_used: bool, cache_key, cacheable: bool = True
+) -> tuple[str, bool]:
+    if not reply_content:
+        logger.error("LLM returned empty content")
+        raise AgentError("LLM returned empty content")
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Agent reply: tool_used=%s, reply=%r",
+            tool_used,
+            reply_content[:120],
+        )
+    reply = reply_content.strip()
+    if cache_key is not None and cacheable:
+        semantic_cache.store(*cache_key, reply, tool_used)
+    return (reply, tool_used)
 
 
 async def run_agent(
@@ -50,82 +311,98 @@ async def run_agent(
     history: list[MessageModel],
     chat_client: AsyncAzureOpenAI,
     mcp_url: str = MCP_SERVER_URL,
+    mcp_client: httpx.AsyncClient | None = None,
 ) -> tuple[str, bool]:
-    logger.info(
-        "Agent invoked: message=%r, history_turns=%d",
-        message[:80],
-        len(history),
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Agent invoked: message=%r, history_turns=%d",
+            message[:80],
+            len(history),
+        )
 
     messages = _build_messages(history, message)
     tool_used = False
-
-    # ── Round 1 ──────────────────────────────────────────────────────────────
-    try:
-        response = await chat_client.chat.completions.create(
-            model=MODEL_DEPLOYMENT_NAME,
-            messages=messages,
-            tools=TOOL_LIST,
-            temperature=0.2,
-        )
-    except Exception as exc:
-        logger.error("LLM call failed (round 1): %s", exc)
-        raise AgentError("model unavailable") from exc
-
-    choice = response.choices[0]
-
-    if choice.finish_reason == "tool_calls":
-        tool_call = choice.message.tool_calls[0]
-
-        # Parse tool arguments
+    weather_ok = True
+
+    cache_key = await _embed_query(chat_client, history, message)
+    if cache_key is not None:
+        cached = semantic_cache.lookup(*cache_key)
+        if cached is not None:
+            logger.info("Semantic cache hit: tool_used=%s", cached[1])
+            return cached
+
+    # ── Fast path ────────────────────────────────────────────────────────────
+    fast_location = _try_fast_path(message)
+    if fast_location is not None:
+        logger.info("Fast path: location=%r, mcp_url=%s", fast_location, mcp_url)
+        result, weather_ok = await _fetch_weather(fast_location, mcp_url, mcp_client)
+        logger.debug("MCP response: location=%r, body=%s", fast_location, result)
+        _inject_weather(messages, fast_location, result)
         try:
-            args = json.loads(tool_call.function.arguments)
-            location = args["location"]
-            if not isinstance(location, str) or not location:
-                raise ValueError("location must be a non-empty string")
-        except (json.JSONDecodeError, KeyError, ValueError) as exc:
-            logger.error(
-                "Malformed tool arguments: %r — %s",
-                tool_call.function.arguments,
-                exc,
+            response = await _create(
+                chat_client,
+                model=MODEL_DEPLOYMENT_NAME,
+                messages=messages,
+                temperature=0.2,
             )
-            return ("I encountered an issue. Could you rephrase it?", False)
-
-        logger.info("Tool invocation: location=%r, mcp_url=%s", location, mcp_url)
-        result = await execute_get_current_weather(location, mcp_url)
-        logger.info("MCP response: location=%r, body=%s", location, result)
-
-        # Append round 1 assistant message and tool result
-        messages.append(choice.message)
-        messages.append({"role": "tool", "content": result, "tool_call_id": tool_call.id})
+        except Exception as exc:
+            logger.error("LLM call failed (fast path): %s", exc)
+            raise AgentError("model unavailable") from exc
+        return _finalize_reply(response.choices[0].message.content, True, cache_key, weather_ok)
 
-        # ── Round 2 ──────────────────────────────────────────────────────────
+    prefetch = _start_prefetch(message, mcp_url, mcp_client)
+    try:
+        # ── Round 1 ──────────────────────────────────────────────────────────
         try:
-            response2 = await chat_client.chat.completions.create(
+            response = await _create(
+                chat_client,
                 model=MODEL_DEPLOYMENT_NAME,
                 messages=messages,
+                tools=TOOL_LIST_FROZEN,
                 temperature=0.2,
             )
         except Exception as exc:
-            logger.error("LLM call failed (round 2): %s", exc)
+            logger.error("LLM call failed (round 1): %s", exc)
             raise AgentError("model unavailable") from exc
 
-        reply_content = response2.choices[0].message.content
-        tool_used = True
-    else:
-        # stop — direct answer or out-of-scope
-        reply_content = choice.message.content
+        choice = response.choices[0]
 
-    if not reply_content:
-        logger.error("LLM returned empty content")
-        raise AgentError("LLM returned empty content")
+        if choice.finish_reason == "tool_calls":
+            tool_call = choice.message.tool_calls[0]
 
-    logger.info(
-        "Agent reply: tool_used=%s, reply=%r",
-        tool_used,
-        reply_content[:120],
-    )
-    return (reply_content.strip(), tool_used)
+            location = _parse_tool_location(tool_call)
+            if location is None:
+                return ("I encountered an issue. Could you rephrase it?", False)
+
+            logger.info("Tool invocation: location=%r, mcp_url=%s", location, mcp_url)
+            result, weather_ok = await _fetch_weather(location, mcp_url, mcp_client, prefetch)
+            logger.debug("MCP response: location=%r, body=%s", location, result)
+
+            # Append round 1 assistant message and tool result
+            messages.append(choice.message)
+            messages.append({"role": "tool", "content": result, "tool_call_id": tool_call.id})
+
+            # ── Round 2 ──────────────────────────────────────────────────────
+            try:
+                response2 = await _create(
+                    chat_client,
+                    model=MODEL_DEPLOYMENT_NAME,
+                    messages=messages,
+                    temperature=0.2,
+                )
+            except Exception as exc:
+                logger.error("LLM call failed (round 2): %s", exc)
+                raise AgentError("model unavailable") from exc
+
+            reply_content = response2.choices[0].message.content
+            tool_used = True
+        else:
+            # stop — direct answer or out-of-scope
+            reply_content = choice.message.content
+    finally:
+        _cancel_prefetch(prefetch)
+
+    return _finalize_reply(reply_content, tool_used, cache_key, weather_ok)
 
 
 async def run_agent_stream(
@@ -133,90 +410,147 @@ async def run_agent_stream(
     history: list[MessageModel],
     chat_client: AsyncAzureOpenAI,
     mcp_url: str = MCP_SERVER_URL,
+    mcp_client: httpx.AsyncClient | None = None,
 ):
     """Async generator version of run_agent — yields SSE event dicts."""
-    logger.info(
-        "Agent stream invoked: message=%r, history_turns=%d",
-        message[:80],
-        len(history),
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Agent stream invoked: message=%r, history_turns=%d",
+            message[:80],
+            len(history),
+        )
 
-    yield {"type": "status", "message": "Analyzing your question..."}
+    yield STATUS_ANALYZING
 
     messages = _build_messages(history, message)
 
-    # ── Round 1 ──────────────────────────────────────────────────────────────
-    try:
-        response = await chat_client.chat.completions.create(
-            model=MODEL_DEPLOYMENT_NAME,
-            messages=messages,
-            tools=TOOL_LIST,
-            temperature=0.2,
-        )
-    except Exception as exc:
-        logger.error("LLM call failed (round 1): %s", exc)
-        yield {"type": "error", "message": "The weather service is currently unavailable. Please try again."}
-        return
+    cache_key = await _embed_query(chat_client, history, message)
+    if cache_key is not None:
+        cached = semantic_cache.lookup(*cache_key)
+        if cached is not None:
+            logger.info("Semantic cache hit: tool_used=%s", cached[1])
+            yield {"type": "result", "reply": cached[0], "tool_used": cached[1]}
+            return
 
-    choice = response.choices[0]
+    # ── Fast path ────────────────────────────────────────────────────────────
+    fast_location = _try_fast_path(message)
+    if fast_location is not None:
+        yield {"type": "status", "message": f"Fetching weather data for {fast_location}..."}
 
-    if choice.finish_reason == "tool_calls":
-        tool_call = choice.message.tool_calls[0]
+        logger.info("Fast path: location=%r, mcp_url=%s", fast_location, mcp_url)
+        result, weather_ok = await _fetch_weather(fast_location, mcp_url, mcp_client)
+        logger.debug("MCP response: location=%r, body=%s", fast_location, result)
+        _inject_weather(messages, fast_location, result)
 
-        # Parse tool arguments
+        # Open the stream first so the status event overlaps the request
+        stream_task = _open_stream(chat_client, messages)
+        parts: list[str] = []
         try:
-            args = json.loads(tool_call.function.arguments)
-            location = args["location"]
-            if not isinstance(location, str) or not location:
-                raise ValueError("location must be a non-empty string")
-        except (json.JSONDecodeError, KeyError, ValueError) as exc:
-            logger.error(
-                "Malformed tool arguments: %r — %s",
-                tool_call.function.arguments,
-                exc,
-            )
-            yield {"type": "error", "message": "I encountered an issue parsing the request. Could you rephrase it?"}
+            yield STATUS_GENERATING
+            # Closing on any exit, including a client disconnect, frees the pooled connection
+            async with await stream_task as stream:
+                async for delta in _batched_deltas(stream):
+                    parts.append(delta)
+                    yield {"type": "token", "delta": delta}
+        except Exception as exc:
+            logger.error("LLM call failed (fast path): %s", exc)
+            yield ERROR_LLM_UNAVAILABLE
             return
+        finally:
+            await _close_stream_task(stream_task)
 
-        yield {"type": "status", "message": f"Fetching weather data for {location}..."}
-
-        logger.info("Tool invocation: location=%r, mcp_url=%s", location, mcp_url)
-        result = await execute_get_current_weather(location, mcp_url)
-        logger.info("MCP response: location=%r, body=%s", location, result)
-
-        # Append round 1 assistant message and tool result
-        messages.append(choice.message)
-        messages.append({"role": "tool", "content": result, "tool_call_id": tool_call.id})
+        reply_content = "".join(parts)
+        if not reply_content:
+            logger.error("LLM returned empty content (fast path)")
+            yield ERROR_EMPTY_REPLY
+            return
 
-        yield {"type": "status", "message": "Generating response..."}
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Agent stream reply: tool_used=True, reply=%r", reply_content[:120])
+        reply = reply_content.strip()
+        if cache_key is not None and weather_ok:
+            semantic_cache.store(*cache_key, reply, True)
+        yield {"type": "result", "reply": reply, "tool_used": True}
+        return
 
-        # ── Round 2 ──────────────────────────────────────────────────────────
+    prefetch = _start_prefetch(message, mcp_url, mcp_client)
+    try:
+        # ── Round 1 ──────────────────────────────────────────────────────────
         try:
-            response2 = await chat_client.chat.completions.create(
+            response = await _create(
+                chat_client,
                 model=MODEL_DEPLOYMENT_NAME,
                 messages=messages,
+                tools=TOOL_LIST_FROZEN,
                 temperature=0.2,
             )
         except Exception as exc:
-            logger.error("LLM call failed (round 2): %s", exc)
-            yield {"type": "error", "message": "The weather service is currently unavailable. Please try again."}
-            return
-
-        reply_content = response2.choices[0].message.content
-        if not reply_content:
-            logger.error("LLM returned empty content (round 2)")
-            yield {"type": "error", "message": "The model returned an empty response. Please try again."}
-            return
-
-        logger.info("Agent stream reply: tool_used=True, reply=%r", reply_content[:120])
-        yield {"type": "result", "reply": reply_content.strip(), "tool_used": True}
-    else:
-        # stop — direct answer or out-of-scope
-        reply_content = choice.message.content
-        if not reply_content:
-            logger.error("LLM returned empty content (round 1, no tool)")
-            yield {"type": "error", "message": "The model returned an empty response. Please try again."}
+            logger.error("LLM call failed (round 1): %s", exc)
+            yield ERROR_LLM_UNAVAILABLE
             return
 
-        logger.info("Agent stream reply: tool_used=False, reply=%r", reply_content[:120])
-        yield {"type": "result", "reply": reply_content.strip(), "tool_used": False}
+        choice = response.choices[0]
+
+        if choice.finish_reason == "tool_calls":
+            tool_call = choice.message.tool_calls[0]
+
+            location = _parse_tool_location(tool_call)
+            if location is None:
+                yield ERROR_BAD_TOOL_ARGS
+                return
+
+            yield {"type": "status", "message": f"Fetching weather data for {location}..."}
+
+            logger.info("Tool invocation: location=%r, mcp_url=%s", location, mcp_url)
+            result, weather_ok = await _fetch_weather(location, mcp_url, mcp_client, prefetch)
+            logger.debug("MCP response: location=%r, body=%s", location, result)
+
+            # Append round 1 assistant message and tool result
+            messages.append(choice.message)
+            messages.append({"role": "tool", "content": result, "tool_call_id": tool_call.id})
+
+            # ── Round 2 ──────────────────────────────────────────────────────
+            # Open the stream first so the status event overlaps the request
+            stream_task = _open_stream(chat_client, messages)
+            parts: list[str] = []
+            try:
+                yield STATUS_GENERATING
+                async with await stream_task as stream:
+                    async for delta in _batched_deltas(stream):
+                        parts.append(delta)
+                        yield {"type": "token", "delta": delta}
+            except Exception as exc:
+                logger.error("LLM call failed (round 2): %s", exc)
+                yield ERROR_LLM_UNAVAILABLE
+                return
+            finally:
+                await _close_stream_task(stream_task)
+
+            reply_content = "".join(parts)
+            if not reply_content:
+                logger.error("LLM returned empty content (round 2)")
+                yield ERROR_EMPTY_REPLY
+                return
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Agent stream reply: tool_used=True, reply=%r", reply_content[:120])
+            reply = reply_content.strip()
+            if cache_key is not None and weather_ok:
+                semantic_cache.store(*cache_key, reply, True)
+            yield {"type": "result", "reply": reply, "tool_used": True}
+        else:
+            # stop — direct answer or out-of-scope
+            reply_content = choice.message.content
+            if not reply_content:
+                logger.error("LLM returned empty content (round 1, no tool)")
+                yield ERROR_EMPTY_REPLY
+                return
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Agent stream reply: tool_used=False, reply=%r", reply_content[:120])
+            reply = reply_content.strip()
+            if cache_key is not None:
+                semantic_cache.store(*cache_key, reply, False)
+            yield {"type": "result", "reply": reply, "tool_used": False}
+    finally:
+        _cancel_prefetch(prefetch)
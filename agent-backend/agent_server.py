@@ -1,12 +1,18 @@
-import json
+import asyncio
+import atexit
 import logging
 import os
+import queue
+import sys
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
+import httpx
+import orjson
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, StreamingResponse
 
@@ -14,34 +20,87 @@ from agent import (
     AgentError,
     MCP_SERVER_URL,
     MODEL_DEPLOYMENT_NAME,
+    STATIC_EVENTS,
     _make_chat_client,
+    llm_overloaded,
     run_agent,
     run_agent_stream,
 )
 from openai import AsyncAzureOpenAI
-from models import AgentHealthResponse, ChatRequest, ChatResponse
+from pydantic import ValidationError
+from models import AgentHealthResponse, ChatRequest, ChatResponse, MessageModel
+from tools import close_client, get_client
 
 # Load .env from project root (one level above agent-backend/)
 load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
 
-logging.basicConfig(level=logging.INFO)
+# Handlers run on a listener thread so log I/O never blocks the event loop
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
 logger = logging.getLogger(__name__)
 
+_HISTORY_ROLES = frozenset({"user", "assistant"})
+
+_WARMUP_TIMEOUT_SECONDS = 3.0
+
+
+def _sse_frame(event: dict) -> bytes:
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+# Fixed agent events are encoded once; keyed by identity since the dicts are module constants
+_STATIC_FRAMES = {id(event): _sse_frame(event) for event in STATIC_EVENTS}
+_FRAME_SERVICE_UNAVAILABLE = _sse_frame({"type": "error", "message": "Chat service not available."})
+_FRAME_UNEXPECTED_ERROR = _sse_frame({"type": "error", "message": "An unexpected error occurred."})
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialised in a single orjson pass, without response-model validation."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
 _chat_client: AsyncAzureOpenAI | None = None
+_mcp_client: httpx.AsyncClient | None = None
+
+
+async def _warm_up_connections() -> None:
+    """Pay DNS, TLS and connection setup at startup instead of on the first /chat."""
+    probes = [_mcp_client.get(f"{MCP_SERVER_URL}/health")]
+    if _chat_client is not None:
+        probes.append(_chat_client.models.list())
+
+    results = await asyncio.gather(
+        *(asyncio.wait_for(probe, timeout=_WARMUP_TIMEOUT_SECONDS) for probe in probes),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Connection warm-up probe failed: %r", result)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _chat_client
+    global _chat_client, _mcp_client
     try:
         _chat_client = _make_chat_client()
         logger.info("Chat client initialized successfully.")
     except Exception as exc:
         logger.warning("Failed to initialize chat client: %s", exc)
+    _mcp_client = get_client()
+    await _warm_up_connections()
     yield
     if _chat_client is not None:
+        # Also closes the shared httpx pool passed in by _make_chat_client
         await _chat_client.close()
         logger.info("Chat client closed.")
+    await close_client()
+    _mcp_client = None
 
 
 app = FastAPI(
@@ -49,68 +108,140 @@ app = FastAPI(
     description="LLM agent backend for the Azure Agentic Weather App.",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# The body is parsed by parse_chat_request rather than a ChatRequest parameter, so FastAPI
+# cannot infer it; document it explicitly, with nested models hoisted into components
+_CHAT_REQUEST_SCHEMA = ChatRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+_CHAT_REQUEST_DEFS = _CHAT_REQUEST_SCHEMA.pop("$defs", {})
+_CHAT_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": _CHAT_REQUEST_SCHEMA}},
+    },
+}
+
+
+def _openapi() -> dict:
+    if app.openapi_schema is None:
+        schema = FastAPI.openapi(app)
+        schema.setdefault("components", {}).setdefault("schemas", {}).update(_CHAT_REQUEST_DEFS)
+    return app.openapi_schema
+
+
+app.openapi = _openapi
+
 
 # ── Custom exception handlers ────────────────────────────────────────────────
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(status_code=400, content={"error": "Invalid request body."})
+    return ORJSONResponse(status_code=400, content={"error": "Invalid request body."})
+
+
+# ── Request parsing ──────────────────────────────────────────────────────────
+
+async def parse_chat_request(request: Request) -> ChatRequest:
+    """Decode a chat body with orjson, skipping per-field validation for well-formed input.
+
+    Anything the fast path does not recognise goes through full ChatRequest
+    validation, so malformed bodies still produce a 400.
+    """
+    body = await request.body()
+    try:
+        raw = orjson.loads(body)
+        message = raw["message"]
+        history = raw.get("history", [])
+        if (
+            isinstance(message, str)
+            and message
+            and isinstance(history, list)
+            and all(
+                isinstance(h, dict)
+                and h.get("role") in _HISTORY_ROLES
+                and isinstance(h.get("content"), str)
+                for h in history
+            )
+        ):
+            return ChatRequest.model_construct(
+                message=message,
+                history=[
+                    MessageModel.model_construct(role=h["role"], content=h["content"])
+                    for h in history
+                ],
+            )
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        pass
+
+    try:
+        return ChatRequest.model_validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
 
 
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
-@app.get("/health", response_model=AgentHealthResponse)
-async def health() -> AgentHealthResponse:
-    return AgentHealthResponse(
-        status="ok",
-        model=MODEL_DEPLOYMENT_NAME,
-        mcp_url=MCP_SERVER_URL,
-    )
+@app.get("/health", responses={200: {"model": AgentHealthResponse}})
+async def health() -> ORJSONResponse:
+    return ORJSONResponse({
+        "status": "ok",
+        "model": MODEL_DEPLOYMENT_NAME,
+        "mcp_url": MCP_SERVER_URL,
+    })
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest) -> ChatResponse:
-    logger.info(
-        "Incoming POST /chat: message=%r, history_count=%d",
-        request.message[:80],
-        len(request.history),
-    )
+@app.post("/chat", responses={200: {"model": ChatResponse}}, openapi_extra=_CHAT_REQUEST_OPENAPI)
+async def chat(request: ChatRequest = Depends(parse_chat_request)) -> ORJSONResponse:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Incoming POST /chat: message=%r, history_count=%d",
+            request.message[:80],
+            len(request.history),
+        )
 
     if _chat_client is None:
         logger.error("AgentError in /chat: chat client not initialized")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": "Chat service not available."},
         )
 
+    if llm_overloaded():
+        logger.warning("Shedding /chat request: LLM concurrency limit reached")
+        return ORJSONResponse(status_code=503, content={"error": "Chat service is busy. Please try again."})
+
     try:
         reply, tool_used = await run_agent(
             message=request.message,
             history=request.history,
             chat_client=_chat_client,
             mcp_url=MCP_SERVER_URL,
+            mcp_client=_mcp_client,
         )
-        return ChatResponse(reply=reply, tool_used=tool_used)
+        return ORJSONResponse({"reply": reply, "tool_used": tool_used})
     except AgentError as exc:
         logger.error("AgentError in /chat: %s", exc)
-        return JSONResponse(status_code=500, content={"error": str(exc)})
+        return ORJSONResponse(status_code=500, content={"error": str(exc)})
     except Exception:
         logger.error("Unexpected exception in /chat", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": "An unexpected error occurred."},
         )
 
 
-@app.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+@app.post("/chat/stream", openapi_extra=_CHAT_REQUEST_OPENAPI)
+async def chat_stream(request: ChatRequest = Depends(parse_chat_request)):
     if _chat_client is None:
         async def _err():
-            yield f'data: {json.dumps({"type": "error", "message": "Chat service not available."})}\n\n'
+            yield _FRAME_SERVICE_UNAVAILABLE
         return StreamingResponse(_err(), media_type="text/event-stream")
 
+    if llm_overloaded():
+        logger.warning("Shedding /chat/stream request: LLM concurrency limit reached")
+        return ORJSONResponse(status_code=503, content={"error": "Chat service is busy. Please try again."})
+
     async def _generate():
         try:
             async for event in run_agent_stream(
@@ -118,11 +249,12 @@ async def chat_stream(request: ChatRequest):
                 history=request.history,
                 chat_client=_chat_client,
                 mcp_url=MCP_SERVER_URL,
+                mcp_client=_mcp_client,
             ):
-                yield f"data: {json.dumps(event)}\n\n"
+                yield _STATIC_FRAMES.get(id(event)) or _sse_frame(event)
         except Exception:
             logger.error("Unexpected exception in /chat/stream", exc_info=True)
-            yield f'data: {json.dumps({"type": "error", "message": "An unexpected error occurred."})}\n\n'
+            yield _FRAME_UNEXPECTED_ERROR
 
     return StreamingResponse(_generate(), media_type="text/event-stream")
 
@@ -133,4 +265,10 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=int(os.getenv("AGENT_PORT", "8001")),
         reload=False,
+        # uvloop does not support Windows
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=int(os.getenv("AGENT_WORKERS", "1")),
+        backlog=2048,
+        timeout_keep_alive=75,
     )
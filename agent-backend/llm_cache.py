@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+
+from cachetools import TTLCache
+from openai import AsyncAzureOpenAI
+from pydantic import BaseModel
+
+from tools import TOOL_LIST_FROZEN, TOOL_LIST_JSON
+
+logger = logging.getLogger(__name__)
+
+# Completions sampled above this temperature are not deterministic enough to replay
+MAX_CACHEABLE_TEMPERATURE = 0.3
+
+_cache: TTLCache = TTLCache(maxsize=1024, ttl=600)
+
+
+def _json_default(obj):
+    # Round-2 message lists carry the round-1 ChatCompletionMessage object
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(exclude_none=True)
+    return repr(obj)
+
+
+def _tools_bytes(tools) -> bytes:
+    if tools is None:
+        return b"null"
+    if tools is TOOL_LIST_FROZEN:
+        return TOOL_LIST_JSON
+    return json.dumps(tools, sort_keys=True, default=_json_default).encode()
+
+
+def _cache_key(kwargs: dict) -> str:
+    payload = json.dumps(
+        {
+            "model": kwargs.get("model"),
+            "messages": kwargs["messages"],
+            "temperature": kwargs.get("temperature"),
+        },
+        sort_keys=True,
+        default=_json_default,
+    )
+    digest = hashlib.sha256(payload.encode())
+    digest.update(b"\x00")
+    digest.update(_tools_bytes(kwargs.get("tools")))
+    return digest.hexdigest()
+
+
+async def cached_create(client: AsyncAzureOpenAI, **kwargs):
+    """Drop-in for client.chat.completions.create that replays identical low-temperature calls."""
+    temperature = kwargs.get("temperature")
+    if kwargs.get("stream") or temperature is None or temperature > MAX_CACHEABLE_TEMPERATURE:
+        return await client.chat.completions.create(**kwargs)
+
+    key = _cache_key(kwargs)
+    cached = _cache.get(key)
+    if cached is not None:
+        logger.debug("LLM cache hit: key=%s", key[:12])
+        return cached
+
+    response = await client.chat.completions.create(**kwargs)
+    _cache[key] = response
+    return response
+
+
+def clear_cache() -> None:
+    _cache.clear()
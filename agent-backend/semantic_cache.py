@@ -0,0 +1,100 @@
+import logging
+import time
+
+import numpy as np
+from openai import AsyncAzureOpenAI
+
+SIMILARITY_THRESHOLD = 0.92
+MAX_AGE_SECONDS = 600.0
+CAPACITY = 2048
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Ring buffer of (embedding, location, reply, tool_used) entries searched by cosine similarity.
+
+    A hit also requires the stored location to equal the query's, since short templated
+    queries for different cities can embed almost identically.
+    """
+
+    def __init__(
+        self,
+        capacity: int = CAPACITY,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_age: float = MAX_AGE_SECONDS,
+    ):
+        self._capacity = capacity
+        self._threshold = threshold
+        self._max_age = max_age
+        self._matrix: np.ndarray | None = None  # (capacity, dim) float32, rows L2-normalised
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._locations = np.full(capacity, None, dtype=object)
+        self._entries: list[tuple[str, bool] | None] = [None] * capacity
+        self._next = 0
+        self._size = 0
+
+    def lookup(self, vec: np.ndarray, location: str) -> tuple[str, bool] | None:
+        if self._size == 0 or self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+            return None
+
+        sims = self._matrix[: self._size] @ vec
+        stale = self._timestamps[: self._size] < time.monotonic() - self._max_age
+        sims[stale] = -1.0
+        sims[self._locations[: self._size] != location] = -1.0
+
+        best = int(np.argmax(sims))
+        if sims[best] > self._threshold:
+            return self._entries[best]
+        return None
+
+    def store(self, vec: np.ndarray, location: str, reply: str, tool_used: bool) -> None:
+        if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+            self._matrix = np.zeros((self._capacity, vec.shape[0]), dtype=np.float32)
+            self._size = 0
+            self._next = 0
+
+        slot = self._next
+        self._matrix[slot] = vec
+        self._timestamps[slot] = time.monotonic()
+        self._locations[slot] = location
+        self._entries[slot] = (reply, tool_used)
+        self._next = (slot + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def clear(self) -> None:
+        self._matrix = None
+        self._locations[:] = None
+        self._entries = [None] * self._capacity
+        self._next = 0
+        self._size = 0
+
+
+_cache = SemanticCache()
+
+
+async def embed(client: AsyncAzureOpenAI, model: str, text: str) -> np.ndarray | None:
+    """Return the L2-normalised embedding for text, or None if the call fails."""
+    try:
+        response = await client.embeddings.create(model=model, input=text)
+    except Exception as exc:
+        logger.warning("Embedding call failed, bypassing semantic cache: %s", exc)
+        return None
+
+    vec = np.asarray(response.data[0].embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0:
+        return None
+    return vec / norm
+
+
+def lookup(vec: np.ndarray, location: str) -> tuple[str, bool] | None:
+    return _cache.lookup(vec, location)
+
+
+def store(vec: np.ndarray, location: str, reply: str, tool_used: bool) -> None:
+    _cache.store(vec, location, reply, tool_used)
+
+
+def clear_cache() -> None:
+    _cache.clear()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import httpx
+import pytest_asyncio
+
+# Ensure agent-backend/ is on the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import agent_server as server
+
+
+@pytest_asyncio.fixture
+async def client():
+    # In-process ASGI client on the test's own loop. The lifespan is not entered,
+    # so tests patch _chat_client / _mcp_client as needed.
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as c:
+        yield c
@@ -0,0 +1,57 @@
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import orjson
+import respx
+
+# Ensure agent-backend/ is on the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tools import execute_get_current_weather
+
+MCP_URL = "http://mcp.test"
+WEATHER_URL = f"{MCP_URL}/weather"
+
+
+@respx.mock
+async def test_transient_503_is_retried_honouring_retry_after():
+    route = respx.get(WEATHER_URL).mock(side_effect=[
+        httpx.Response(503, json={"error": "busy"}, headers={"Retry-After": "1"}),
+        httpx.Response(200, json={"location": "Austin", "temperature": 72}),
+    ])
+
+    async with httpx.AsyncClient() as client:
+        with patch("tools.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            result = await execute_get_current_weather("Austin", MCP_URL, client)
+
+    assert orjson.loads(result)["location"] == "Austin"
+    assert route.call_count == 2
+    mock_sleep.assert_awaited_once_with(1.0)
+
+
+@respx.mock
+async def test_404_is_not_retried():
+    route = respx.get(WEATHER_URL).mock(
+        return_value=httpx.Response(404, json={"error": "Location not found."})
+    )
+
+    async with httpx.AsyncClient() as client:
+        with patch("tools.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            result = await execute_get_current_weather("Nowhere", MCP_URL, client)
+
+    assert "was not found" in orjson.loads(result)["error"]
+    assert route.call_count == 1
+    mock_sleep.assert_not_awaited()
+
+
+@respx.mock
+async def test_timeout_is_not_retried():
+    route = respx.get(WEATHER_URL).mock(side_effect=httpx.ReadTimeout("slow"))
+
+    async with httpx.AsyncClient() as client:
+        result = await execute_get_current_weather("Austin", MCP_URL, client)
+
+    assert orjson.loads(result) == {"error": "Weather service timed out."}
+    assert route.call_count == 1
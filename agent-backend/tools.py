@@ -1,7 +1,9 @@
-import json
+import asyncio
 import logging
+import random
 
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -22,20 +24,94 @@ WEATHER_TOOL = {
 
 TOOL_LIST = [WEATHER_TOOL]
 
+# Immutable view passed to every completion call; entries are plain dicts, never copied per request
+TOOL_LIST_FROZEN = tuple(TOOL_LIST)
 
-async def execute_get_current_weather(location: str, mcp_url: str) -> str:
-    """Call the MCP server. Always returns a JSON string, never raises."""
-    url = f"{mcp_url}/weather"
+# Serialised once at import so per-call hashing never re-encodes the static schema
+TOOL_LIST_JSON: bytes = orjson.dumps(TOOL_LIST)
+
+
+_CLIENT: httpx.AsyncClient | None = None
+
+# Transient MCP failures get one more attempt after a short jittered backoff
+_MAX_ATTEMPTS = 2
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_MAX_RETRY_AFTER_SECONDS = 2.0
+
+# Parsed /weather endpoint per MCP base URL, so the URL is not re-parsed on every call
+_WEATHER_URLS: dict[str, httpx.URL] = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the process-wide MCP client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            http2=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
+    return _CLIENT
+
+
+async def close_client() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    """Backoff before the next attempt, honouring a numeric Retry-After header (capped)."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return min(max(float(retry_after), 0.0), _MAX_RETRY_AFTER_SECONDS)
+            except ValueError:
+                pass
+    return 0.1 * (2 ** attempt) + random.random() * 0.05
+
+
+async def execute_get_current_weather(
+    location: str,
+    mcp_url: str,
+    client: httpx.AsyncClient | None = None,
+) -> str:
+    """Call the MCP server. Always returns a JSON string, never raises.
+
+    Uses the shared client from get_client() unless another client is passed.
+    Transient 502/503/504 responses and connection errors are retried once;
+    timeouts are not, since the MCP call already waited the full timeout.
+    """
+    url = _WEATHER_URLS.get(mcp_url)
+    if url is None:
+        url = _WEATHER_URLS[mcp_url] = httpx.URL(f"{mcp_url}/weather")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params={"location": location}, timeout=10.0)
+        client = client or get_client()
+        for attempt in range(_MAX_ATTEMPTS):
+            last_attempt = attempt == _MAX_ATTEMPTS - 1
+            try:
+                response = await client.get(url, params=[("location", location)])
+            except httpx.TimeoutException:
+                raise
+            except httpx.RequestError:
+                if last_attempt:
+                    raise
+                logger.warning("MCP request failed for location=%r, retrying", location)
+                await asyncio.sleep(_retry_delay(attempt, None))
+                continue
+            if response.status_code not in _RETRY_STATUSES or last_attempt:
+                break
+            logger.warning("MCP %d for location=%r, retrying", response.status_code, location)
+            await asyncio.sleep(_retry_delay(attempt, response))
 
         if response.status_code == 200:
             return response.text
 
         if response.status_code == 404:
             logger.error("MCP 404: location=%r not found", location)
-            return json.dumps({"error": f"Location '{location}' was not found."})
+            return orjson.dumps({"error": f"Location '{location}' was not found."}).decode()
 
         body = response.json()
         error_msg = body.get("error", "Unknown error from weather service.")
@@ -45,11 +121,11 @@ async def execute_get_current_weather(location: str, mcp_url: str) -> str:
             location,
             error_msg,
         )
-        return json.dumps({"error": error_msg})
+        return orjson.dumps({"error": error_msg}).decode()
 
     except httpx.TimeoutException:
         logger.error("MCP timeout for location=%r", location)
-        return json.dumps({"error": "Weather service timed out."})
+        return orjson.dumps({"error": "Weather service timed out."}).decode()
     except httpx.RequestError:
         logger.error("MCP unreachable for location=%r", location)
-        return json.dumps({"error": "Weather service is unreachable."})
+        return orjson.dumps({"error": "Weather service is unreachable."}).decode()
@@ -5,10 +5,10 @@ Connects to the agent backend via POST /chat/stream (SSE) and renders
 real-time loading stages and markdown replies.
 """
 
-import json
 import os
 
 import httpx
+import orjson
 import streamlit as st
 from dotenv import load_dotenv
 from pathlib import Path
@@ -18,6 +18,28 @@ load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
 AGENT_PORT = int(os.getenv("AGENT_PORT", "8001"))
 AGENT_STREAM_URL = f"http://localhost:{AGENT_PORT}/chat/stream"
 
+
+@st.cache_resource
+def get_agent_client() -> httpx.Client:
+    """Process-wide client so the localhost connection stays warm across reruns."""
+    return httpx.Client(timeout=60.0, limits=httpx.Limits(max_keepalive_connections=4))
+
+
+def iter_sse_data(response: httpx.Response):
+    """Yield the raw payload bytes of each `data: ` line without decoding them to str."""
+    buf = bytearray()
+    for chunk in response.iter_raw(chunk_size=1 << 16):
+        buf += chunk
+        cursor = 0
+        while (end := buf.find(b"\n", cursor)) != -1:
+            # Only data lines are copied out, and only their payload
+            if buf.startswith(b"data: ", cursor, end):
+                stop = end - 1 if buf[end - 1] == 0x0D else end
+                yield bytes(buf[cursor + 6:stop])
+            cursor = end + 1
+        del buf[:cursor]
+
+
 st.set_page_config(page_title="Weather Agent", page_icon="⛅", layout="centered")
 st.title("⛅ Weather Agent")
 
@@ -53,36 +75,45 @@ if prompt := st.chat_input("Ask about the weather..."):
     # ── Stream response ────────────────────────────────────────────────────────
     with st.chat_message("assistant"):
         reply_text = None
+        streamed_text = ""
         tool_used = False
         error_message = None
+        status_lines: list[str] = []
+
+        status_box = st.status("Thinking...", expanded=True)
+        reply_placeholder = st.empty()  # fills in as token events arrive
 
         try:
-            with st.status("Thinking...", expanded=True) as status_box:
-                with httpx.Client(timeout=60.0) as client:
-                    with client.stream("POST", AGENT_STREAM_URL, json=payload) as response:
-                        if response.status_code != 200:
-                            error_message = f"Agent returned error {response.status_code}."
-                            status_box.update(label="Error", state="error", expanded=False)
-                        else:
-                            for line in response.iter_lines():
-                                if not line.startswith("data: "):
-                                    continue
-                                raw = line[len("data: "):]
-                                try:
-                                    event = json.loads(raw)
-                                except json.JSONDecodeError:
-                                    continue
-
-                                etype = event.get("type")
-                                if etype == "status":
-                                    st.write(event.get("message", ""))
-                                elif etype == "result":
-                                    reply_text = event.get("reply", "")
-                                    tool_used = event.get("tool_used", False)
-                                    status_box.update(label="Done", state="complete", expanded=False)
-                                elif etype == "error":
-                                    error_message = event.get("message", "An error occurred.")
-                                    status_box.update(label="Error", state="error", expanded=False)
+            with status_box:
+                status_placeholder = st.empty()  # one in-place block for all status lines
+                client = get_agent_client()
+                with client.stream("POST", AGENT_STREAM_URL, json=payload) as response:
+                    if response.status_code != 200:
+                        error_message = f"Agent returned error {response.status_code}."
+                        status_box.update(label="Error", state="error", expanded=False)
+                    else:
+                        for raw in iter_sse_data(response):
+                            try:
+                                event = orjson.loads(raw)
+                            except orjson.JSONDecodeError:
+                                continue
+
+                            etype = event.get("type")
+                            if etype == "status":
+                                status_lines.append(event.get("message", ""))
+                                status_placeholder.markdown("\n\n".join(status_lines))
+                            elif etype == "token":
+                                if not streamed_text:
+                                    status_box.update(label="Responding...", expanded=False)
+                                streamed_text += event.get("delta", "")
+                                reply_placeholder.markdown(streamed_text)
+                            elif etype == "result":
+                                reply_text = event.get("reply", "")
+                                tool_used = event.get("tool_used", False)
+                                status_box.update(label="Done", state="complete", expanded=False)
+                            elif etype == "error":
+                                error_message = event.get("message", "An error occurred.")
+                                status_box.update(label="Error", state="error", expanded=False)
 
         except httpx.ConnectError:
             error_message = "Could not connect to the weather agent. Is it running?"
@@ -90,10 +121,11 @@ if prompt := st.chat_input("Ask about the weather..."):
             error_message = str(exc)
 
         if error_message:
+            reply_placeholder.empty()
             st.error(error_message)
             # Don't add assistant message on error
         elif reply_text is not None:
-            st.markdown(reply_text)
+            reply_placeholder.markdown(reply_text)
             if tool_used:
                 st.caption("☁ Weather data fetched")
             # Persist to history
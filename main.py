@@ -5,10 +5,11 @@ Usage:
     python main.py
 
 Starts the MCP server, Agent backend, and Streamlit frontend as subprocesses,
-waits for all three to be healthy, then prints the URL. Press Ctrl-C to exit;
+waits concurrently for all three to be healthy, then prints the URL. Press Ctrl-C to exit;
 all servers are terminated cleanly on exit.
 """
 
+import asyncio
 import os
 import sys
 import subprocess
@@ -35,16 +36,17 @@ FRONTEND_HEALTH_URL = f"http://localhost:{FRONTEND_PORT}/_stcore/health"
 
 # ── Health polling ─────────────────────────────────────────────────────────────
 
-def _wait_for_health(url: str, timeout: int, label: str) -> bool:
+async def _wait_for_health(client: httpx.AsyncClient, url: str, timeout: int, label: str) -> bool:
     """Poll GET url until status 200 or timeout (seconds). Returns True on success."""
-    deadline = time.time() + timeout
-    while time.time() < deadline:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
         try:
-            if httpx.get(url, timeout=1.0).status_code == 200:
+            if (await client.get(url, timeout=1.0)).status_code == 200:
                 return True
         except Exception:
             pass
-        time.sleep(0.5)
+        await asyncio.sleep(0.1)
     return False
 
 
@@ -64,6 +66,20 @@ def _shutdown(procs: list, log_files: list) -> None:
 
 # ── Entry point ────────────────────────────────────────────────────────────────
 
+async def _wait_for_all() -> list[tuple[str, str, int, bool]]:
+    """Poll every service concurrently; returns (label, log, timeout, healthy) per service."""
+    checks = [
+        ("MCP server", "mcp_server.log", MCP_HEALTH_URL, 30),
+        ("Agent server", "agent_server.log", AGENT_HEALTH_URL, 30),
+        ("Streamlit frontend", "frontend.log", FRONTEND_HEALTH_URL, 30),
+    ]
+    async with httpx.AsyncClient() as client:
+        results = await asyncio.gather(
+            *(_wait_for_health(client, url, timeout, label) for label, _, url, timeout in checks)
+        )
+    return [(label, log, timeout, ok) for (label, log, _, timeout), ok in zip(checks, results)]
+
+
 def main() -> None:
     log_files = []
     procs = []
@@ -72,7 +88,8 @@ def main() -> None:
         # Open log files
         mcp_log = open(ROOT / "mcp_server.log", "w")
         agent_log = open(ROOT / "agent_server.log", "w")
-        log_files = [mcp_log, agent_log]
+        frontend_log = open(ROOT / "frontend.log", "w")
+        log_files = [mcp_log, agent_log, frontend_log]
 
         # ── Banner ─────────────────────────────────────────────────────────────
         print(
@@ -87,72 +104,45 @@ def main() -> None:
             "╚══════════════════════════════════════╝"
         )
 
-        # ── Start MCP server ───────────────────────────────────────────────────
-        print("Starting MCP server...", end="  ", flush=True)
-        mcp_proc = subprocess.Popen(
+        # ── Start all services ─────────────────────────────────────────────────
+        # The agent tolerates MCP not being up yet, so nothing needs to start serially
+        print("Starting MCP server, Agent server and Streamlit frontend...", flush=True)
+        procs.append(subprocess.Popen(
             [sys.executable, "mcp_server.py"],
             cwd=ROOT / "mcp-server",
             stdout=mcp_log,
             stderr=subprocess.STDOUT,
-        )
-        procs.append(mcp_proc)
-
-        if not _wait_for_health(MCP_HEALTH_URL, timeout=30, label="MCP"):
-            print("FAILED")
-            print(
-                f"Error: MCP server did not become healthy within 30 s.\n"
-                f"Check mcp_server.log for details.",
-                file=sys.stderr,
-            )
-            _shutdown(procs, log_files)
-            sys.exit(1)
-        print("OK")
-
-        # ── Start Agent server ─────────────────────────────────────────────────
-        print("Starting Agent server...", end=" ", flush=True)
-        agent_proc = subprocess.Popen(
+        ))
+        procs.append(subprocess.Popen(
             [sys.executable, "agent_server.py"],
             cwd=ROOT / "agent-backend",
             stdout=agent_log,
             stderr=subprocess.STDOUT,
-        )
-        procs.append(agent_proc)
-
-        if not _wait_for_health(AGENT_HEALTH_URL, timeout=15, label="Agent"):
-            print("FAILED")
-            print(
-                f"Error: Agent server did not become healthy within 15 s.\n"
-                f"Check agent_server.log for details.",
-                file=sys.stderr,
-            )
-            _shutdown(procs, log_files)
-            sys.exit(1)
-        print("OK")
-
-        # ── Start Streamlit frontend ───────────────────────────────────────────
-        print("Starting Streamlit frontend...", end=" ", flush=True)
-        frontend_log = open(ROOT / "frontend.log", "w")
-        log_files.append(frontend_log)
-        frontend_proc = subprocess.Popen(
+        ))
+        procs.append(subprocess.Popen(
             [sys.executable, "-m", "streamlit", "run", "frontend/app.py",
              "--server.port", str(FRONTEND_PORT),
              "--server.headless", "true"],
             cwd=ROOT,
             stdout=frontend_log,
             stderr=subprocess.STDOUT,
-        )
-        procs.append(frontend_proc)
-
-        if not _wait_for_health(FRONTEND_HEALTH_URL, timeout=30, label="Frontend"):
-            print("FAILED")
-            print(
-                f"Error: Streamlit frontend did not become healthy within 30 s.\n"
-                f"Check frontend.log for details.",
-                file=sys.stderr,
-            )
+        ))
+
+        # ── Wait for health ────────────────────────────────────────────────────
+        failed = False
+        for label, log, timeout, ok in asyncio.run(_wait_for_all()):
+            print(f"  {label:<20}{'OK' if ok else 'FAILED'}")
+            if not ok:
+                failed = True
+                print(
+                    f"Error: {label} did not become healthy within {timeout} s.\n"
+                    f"Check {log} for details.",
+                    file=sys.stderr,
+                )
+        if failed:
             _shutdown(procs, log_files)
             sys.exit(1)
-        print("OK\n")
+        print()
 
         print(f"Open your browser at: http://localhost:{FRONTEND_PORT}")
         print("Press Ctrl-C to stop all services.\n")
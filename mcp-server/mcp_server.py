@@ -1,13 +1,16 @@
+import asyncio
 import os
 import logging
+import sys
 from contextlib import asynccontextmanager
-from enum import Enum
 from pathlib import Path
 
 import httpx
+import orjson
 import uvicorn
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
@@ -24,6 +27,20 @@ _LOCATION_NOT_FOUND_CODES = {601, 615}
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Normalised responses keyed by (lower-cased location, units)
+_weather_cache: TTLCache = TTLCache(maxsize=1024, ttl=120)
+# Unknown locations are remembered briefly so typos don't repeat upstream lookups
+_not_found_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+# In-flight upstream fetches; concurrent misses for the same key share one task and its outcome
+_inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialised in a single orjson pass, without response-model validation."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,7 +49,14 @@ async def lifespan(app: FastAPI):
             "WEATHERSTACK_API_KEY is not set. "
             "The /weather endpoint will return 503 until the key is configured."
         )
+    # Shared Weatherstack client so connections are kept alive across requests
+    app.state.client = httpx.AsyncClient(
+        timeout=10.0,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=64),
+    )
     yield
+    await app.state.client.aclose()
 
 
 app = FastAPI(
@@ -40,6 +64,7 @@ app = FastAPI(
     description="Secure REST wrapper around the Weatherstack API.",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -48,7 +73,7 @@ app = FastAPI(
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Return 400 (not FastAPI's default 422) for missing / invalid parameters."""
-    return JSONResponse(status_code=400, content={"error": "Invalid request parameters."})
+    return ORJSONResponse(status_code=400, content={"error": "Invalid request parameters."})
 
 
 @app.exception_handler(HTTPException)
@@ -60,19 +85,13 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         content = {"error": exc.detail}
     else:
         content = {"error": str(exc.detail)}
-    return JSONResponse(status_code=exc.status_code, content=content)
+    return ORJSONResponse(status_code=exc.status_code, content=content)
 
 
 # ── Pydantic models ──────────────────────────────────────────────────────────
 
-class UnitsEnum(str, Enum):
-    fahrenheit = "f"
-    metric = "m"
-    scientific = "s"
-
-
 class WeatherResponse(BaseModel):
-    """Flat normalised weather response matching the spec schema."""
+    """Flat normalised weather response matching the spec schema (documentation only)."""
     location: str
     temperature: int
     feels_like: int
@@ -90,41 +109,32 @@ class HealthResponse(BaseModel):
     api_key_configured: bool
 
 
-# ── Endpoints ────────────────────────────────────────────────────────────────
+# ── Weatherstack fetch + cache ───────────────────────────────────────────────
 
-@app.get("/health", response_model=HealthResponse)
-async def health() -> HealthResponse:
-    return HealthResponse(
-        status="ok",
-        api_key_configured=bool(WEATHERSTACK_API_KEY),
-    )
+def clear_weather_cache() -> None:
+    _weather_cache.clear()
+    _not_found_cache.clear()
 
 
-@app.get("/weather", response_model=WeatherResponse)
-async def get_weather(
-    location: str = Query(..., min_length=1),
-    units: UnitsEnum = Query(UnitsEnum.fahrenheit),
-) -> WeatherResponse:
-    logger.info("Incoming request: location=%r units=%s", location, units.value)
+def _cached(key: tuple[str, str]) -> dict | None:
+    if key in _not_found_cache:
+        raise HTTPException(status_code=404, detail={"error": "Location not found."})
+    return _weather_cache.get(key)
 
-    if not WEATHERSTACK_API_KEY:
-        raise HTTPException(
-            status_code=503,
-            detail={"error": "Weather service is unavailable: API key not configured."},
-        )
 
+async def _fetch_weather(
+    client: httpx.AsyncClient, api_key: str, location: str, units: str
+) -> dict:
+    """Query Weatherstack and normalise the result; raises HTTPException on failure."""
     params = {
-        "access_key": WEATHERSTACK_API_KEY,
+        "access_key": api_key,
         "query": location,
-        "units": units.value,
+        "units": units,
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                WEATHERSTACK_BASE_URL, params=params, timeout=10.0
-            )
-            response.raise_for_status()
+        response = await client.get(WEATHERSTACK_BASE_URL, params=params)
+        response.raise_for_status()
     except httpx.TimeoutException:
         logger.error("Request to Weatherstack timed out for location: %r", location)
         raise HTTPException(
@@ -142,7 +152,7 @@ async def get_weather(
             detail={"error": "External weather service returned an error."},
         )
 
-    data = response.json()
+    data = orjson.loads(response.content)
 
     # Weatherstack always returns HTTP 200; errors are signalled in the body
     if data.get("success") is False:
@@ -173,18 +183,92 @@ async def get_weather(
     descriptions = current.get("weather_descriptions", [])
     description = descriptions[0] if descriptions else ""
 
-    return WeatherResponse(
-        location=loc.get("name", ""),
-        temperature=current.get("temperature", 0),
-        feels_like=current.get("feelslike", 0),
-        humidity=current.get("humidity", 0),
-        wind_speed=current.get("wind_speed", 0),
-        wind_direction=current.get("wind_dir", ""),
-        weather_description=description,
-        uv_index=current.get("uv_index", 0),
-        visibility=current.get("visibility", 0),
-        cloud_cover=current.get("cloudcover", 0),
-    )
+    return {
+        "location": loc.get("name", ""),
+        "temperature": current.get("temperature", 0),
+        "feels_like": current.get("feelslike", 0),
+        "humidity": current.get("humidity", 0),
+        "wind_speed": current.get("wind_speed", 0),
+        "wind_direction": current.get("wind_dir", ""),
+        "weather_description": description,
+        "uv_index": current.get("uv_index", 0),
+        "visibility": current.get("visibility", 0),
+        "cloud_cover": current.get("cloudcover", 0),
+    }
+
+
+async def _fetch_and_cache(
+    client: httpx.AsyncClient, api_key: str, key: tuple[str, str], location: str, units: str
+) -> dict:
+    try:
+        result = await _fetch_weather(client, api_key, location, units)
+    except HTTPException as exc:
+        if exc.status_code == 404:
+            _not_found_cache[key] = True
+        raise
+    _weather_cache[key] = result
+    return result
+
+
+def _singleflight(
+    client: httpx.AsyncClient, api_key: str, key: tuple[str, str], location: str, units: str
+) -> asyncio.Task:
+    """Return the in-flight fetch for key, starting one if none is running."""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_and_cache(client, api_key, key, location, units))
+        _inflight[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            _inflight.pop(key, None)
+            if not t.cancelled():
+                t.exception()  # mark retrieved even if every waiter went away
+
+        task.add_done_callback(_done)
+    return task
+
+
+# ── Dependencies ─────────────────────────────────────────────────────────────
+
+async def get_api_key() -> str | None:
+    """Weatherstack key for this request; tests override it instead of patching the module."""
+    return WEATHERSTACK_API_KEY
+
+
+# ── Endpoints ────────────────────────────────────────────────────────────────
+
+@app.get("/health", responses={200: {"model": HealthResponse}})
+async def health(api_key: str | None = Depends(get_api_key)) -> ORJSONResponse:
+    return ORJSONResponse({
+        "status": "ok",
+        "api_key_configured": bool(api_key),
+    })
+
+
+@app.get("/weather", responses={200: {"model": WeatherResponse}})
+async def get_weather(
+    request: Request,
+    location: str = Query(..., min_length=1),
+    # f = Fahrenheit, m = metric, s = scientific
+    units: str = Query("f", pattern="^[fms]$"),
+    api_key: str | None = Depends(get_api_key),
+) -> ORJSONResponse:
+    logger.info("Incoming request: location=%r units=%s", location, units)
+
+    if not api_key:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Weather service is unavailable: API key not configured."},
+        )
+
+    key = (location.strip().lower(), units)
+    cached = _cached(key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+
+    # Shielded so a disconnecting caller does not cancel the fetch other waiters share
+    result = await asyncio.shield(_singleflight(request.app.state.client, api_key, key, location, units))
+    return ORJSONResponse(result)
 
 
 if __name__ == "__main__":
@@ -193,4 +277,10 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=int(os.getenv("MCP_PORT", "8000")),
         reload=False,
+        # uvloop does not support Windows
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # Each worker keeps its own Weatherstack cache
+        workers=int(os.getenv("MCP_WORKERS", "2")),
+        log_level="info",
     )
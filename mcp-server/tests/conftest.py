@@ -0,0 +1,44 @@
+import httpx
+import pytest
+import pytest_asyncio
+
+import mcp_server as server
+
+
+@pytest_asyncio.fixture(scope="session")
+async def client():
+    # ASGITransport does not run the lifespan, so enter it once for the session
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as c:
+            yield c
+
+
+async def _test_api_key() -> str:
+    return "test_key"
+
+
+async def _no_api_key() -> None:
+    return None
+
+
+@pytest.fixture(autouse=True)
+def api_key():
+    # Tests that need the key missing install their own override on top
+    server.app.dependency_overrides[server.get_api_key] = _test_api_key
+    yield
+    server.app.dependency_overrides.pop(server.get_api_key, None)
+
+
+@pytest.fixture
+def no_api_key(api_key):
+    # Layered on api_key so its teardown still clears the override
+    server.app.dependency_overrides[server.get_api_key] = _no_api_key
+
+
+@pytest_asyncio.fixture(scope="session", autouse=True)
+async def _warmup(client):
+    # Starlette builds the middleware stack on the first request; pay that once up front.
+    # /weather without a location fails validation, so it never reaches Weatherstack.
+    await client.get("/health")
+    await client.get("/weather")
@@ -1,17 +1,19 @@
-import sys
-import os
-
-# Ensure the mcp-server directory is on the path so `mcp_server` can be imported
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import asyncio
 
 import respx
 import httpx
+import orjson
 import pytest
-from fastapi.testclient import TestClient
 
 import mcp_server as server
 
-client = TestClient(server.app)
+
+@pytest.fixture(autouse=True)
+def _clear_weather_cache():
+    server.clear_weather_cache()
+    yield
+    server.clear_weather_cache()
+
 
 MOCK_WEATHERSTACK_SUCCESS = {
     "request": {"type": "City", "query": "Austin, Texas", "language": "en", "unit": "f"},
@@ -66,136 +68,150 @@ MOCK_WEATHERSTACK_GENERIC_ERROR = {
     },
 }
 
+# Encoded once so mocked responses don't re-serialise the payloads on every call
+_JSON_HEADERS = {"content-type": "application/json"}
+SUCCESS_BODY = orjson.dumps(MOCK_WEATHERSTACK_SUCCESS)
+LOCATION_ERROR_BODY = orjson.dumps(MOCK_WEATHERSTACK_LOCATION_ERROR)
+GENERIC_ERROR_BODY = orjson.dumps(MOCK_WEATHERSTACK_GENERIC_ERROR)
+
+
+def _json(response: httpx.Response):
+    return orjson.loads(response.content)
+
+
+# Flat normalised shape required by spec for MOCK_WEATHERSTACK_SUCCESS
+EXPECTED_NORMALIZED = {
+    "location": "Austin",
+    "temperature": 72,
+    "feels_like": 70,           # feelslike → feels_like
+    "humidity": 45,
+    "wind_speed": 10,
+    "wind_direction": "S",      # wind_dir → wind_direction
+    "weather_description": "Sunny",
+    "uv_index": 6,
+    "visibility": 10,
+    "cloud_cover": 5,           # cloudcover → cloud_cover
+}
 
-def test_missing_location_returns_400():
-    response = client.get("/weather")
-    assert response.status_code == 400
-    assert "error" in response.json()
+# One router and Weatherstack route built at import; each test sets the route's response.
+# Entering the router snapshots the route, and leaving it rolls back side effects and call stats.
+_router = respx.mock(assert_all_called=False)
+_weatherstack = _router.get(server.WEATHERSTACK_BASE_URL)
 
 
-def test_invalid_units_returns_400():
-    response = client.get("/weather", params={"location": "Austin", "units": "kelvin"})
-    assert response.status_code == 400
-    assert "error" in response.json()
+async def test_validation_and_health_matrix(client):
+    # Independent requests that never reach Weatherstack, issued concurrently
+    missing_location, invalid_units, health = await asyncio.gather(
+        client.get("/weather"),
+        client.get("/weather", params={"location": "Austin", "units": "kelvin"}),
+        client.get("/health"),
+    )
 
+    assert missing_location.status_code == 400
+    assert "error" in _json(missing_location)
 
-@respx.mock
-def test_successful_response_normalized_shape():
-    respx.get(server.WEATHERSTACK_BASE_URL).mock(
-        return_value=httpx.Response(200, json=MOCK_WEATHERSTACK_SUCCESS)
-    )
+    assert invalid_units.status_code == 400
+    assert "error" in _json(invalid_units)
 
-    original_key = server.WEATHERSTACK_API_KEY
-    server.WEATHERSTACK_API_KEY = "test_key"
-    try:
-        response = client.get("/weather", params={"location": "Austin, Texas"})
-    finally:
-        server.WEATHERSTACK_API_KEY = original_key
-
-    assert response.status_code == 200
-    data = response.json()
-
-    # Flat top-level structure required by spec
-    assert data["location"] == "Austin"
-    assert data["temperature"] == 72
-    assert data["feels_like"] == 70           # feelslike → feels_like
-    assert data["wind_direction"] == "S"      # wind_dir → wind_direction
-    assert data["cloud_cover"] == 5           # cloudcover → cloud_cover
-    assert data["weather_description"] == "Sunny"
-    assert data["humidity"] == 45
-    assert data["uv_index"] == 6
-    assert data["visibility"] == 10
-
-    # Old nested keys must not be present
-    assert "success" not in data
-    assert "current" not in data
-    assert "units" not in data
-
-
-@respx.mock
-def test_location_not_found_returns_404():
-    respx.get(server.WEATHERSTACK_BASE_URL).mock(
-        return_value=httpx.Response(200, json=MOCK_WEATHERSTACK_LOCATION_ERROR)
-    )
+    assert health.status_code == 200
+    data = _json(health)
+    assert data["status"] == "ok"
+    assert isinstance(data["api_key_configured"], bool)
+
+
+def _check_normalized_shape(response: httpx.Response, upstream: httpx.Request) -> None:
+    # Exact match also proves the old nested keys (success, current, units) are gone
+    assert _json(response) == EXPECTED_NORMALIZED
+
+
+def _check_location_not_found(response: httpx.Response, upstream: httpx.Request) -> None:
+    assert _json(response) == {"error": "Location not found."}
 
-    original_key = server.WEATHERSTACK_API_KEY
-    server.WEATHERSTACK_API_KEY = "test_key"
-    try:
-        response = client.get("/weather", params={"location": "BadLocation"})
-    finally:
-        server.WEATHERSTACK_API_KEY = original_key
 
-    assert response.status_code == 404
-    assert response.json() == {"error": "Location not found."}
+def _check_error_body(response: httpx.Response, upstream: httpx.Request) -> None:
+    assert "error" in _json(response)
 
 
-@respx.mock
-def test_generic_api_error_returns_400():
-    respx.get(server.WEATHERSTACK_BASE_URL).mock(
-        return_value=httpx.Response(200, json=MOCK_WEATHERSTACK_GENERIC_ERROR)
+def _check_default_units(response: httpx.Response, upstream: httpx.Request) -> None:
+    assert upstream.url.params.get("units") == "f"
+
+
+@_router
+@pytest.mark.parametrize(
+    "location, body, expected_status, validator",
+    [
+        pytest.param("Austin, Texas", SUCCESS_BODY, 200, _check_normalized_shape, id="normalized-shape"),
+        pytest.param("BadLocation", LOCATION_ERROR_BODY, 404, _check_location_not_found, id="location-not-found"),
+        pytest.param("Austin", GENERIC_ERROR_BODY, 400, _check_error_body, id="generic-api-error"),
+        pytest.param("Austin", SUCCESS_BODY, 200, _check_default_units, id="default-units-fahrenheit"),
+    ],
+)
+async def test_weather_proxy(client, location, body, expected_status, validator):
+    route = _weatherstack.mock(
+        return_value=httpx.Response(200, content=body, headers=_JSON_HEADERS)
     )
 
-    original_key = server.WEATHERSTACK_API_KEY
-    server.WEATHERSTACK_API_KEY = "test_key"
-    try:
-        response = client.get("/weather", params={"location": "Austin"})
-    finally:
-        server.WEATHERSTACK_API_KEY = original_key
+    response = await client.get("/weather", params={"location": location})
 
-    assert response.status_code == 400
-    assert "error" in response.json()
+    assert response.status_code == expected_status
+    validator(response, route.calls.last.request)
 
 
-def test_missing_api_key_returns_503(monkeypatch):
-    monkeypatch.setattr(server, "WEATHERSTACK_API_KEY", None)
-    response = client.get("/weather", params={"location": "Austin"})
+@pytest.mark.usefixtures("no_api_key")
+async def test_missing_api_key_returns_503(client):
+    response = await client.get("/weather", params={"location": "Austin"})
     assert response.status_code == 503
-    assert "error" in response.json()
+    assert "error" in _json(response)
 
 
-def test_health_endpoint_returns_200():
-    response = client.get("/health")
-    assert response.status_code == 200
-    data = response.json()
-    assert data["status"] == "ok"
-    assert isinstance(data["api_key_configured"], bool)
+@_router
+async def test_repeated_request_served_from_cache(client):
+    route = _weatherstack.mock(
+        return_value=httpx.Response(200, content=SUCCESS_BODY, headers=_JSON_HEADERS)
+    )
+
+    first = await client.get("/weather", params={"location": "Austin"})
+    second = await client.get("/weather", params={"location": " austin "})
 
+    assert first.status_code == second.status_code == 200
+    assert _json(first) == _json(second)
+    assert route.call_count == 1
 
-@respx.mock
-def test_default_units_is_fahrenheit():
-    captured_request = None
 
-    def capture(request):
-        nonlocal captured_request
-        captured_request = request
-        return httpx.Response(200, json=MOCK_WEATHERSTACK_SUCCESS)
+@_router
+async def test_location_not_found_is_negatively_cached(client):
+    route = _weatherstack.mock(
+        return_value=httpx.Response(200, content=LOCATION_ERROR_BODY, headers=_JSON_HEADERS)
+    )
+
+    responses = [await client.get("/weather", params={"location": "BadLocation"}) for _ in range(2)]
+
+    assert [r.status_code for r in responses] == [404, 404]
+    assert _json(responses[1]) == {"error": "Location not found."}
+    assert route.call_count == 1
 
-    respx.get(server.WEATHERSTACK_BASE_URL).mock(side_effect=capture)
 
-    original_key = server.WEATHERSTACK_API_KEY
-    server.WEATHERSTACK_API_KEY = "test_key"
-    try:
-        client.get("/weather", params={"location": "Austin"})
-    finally:
-        server.WEATHERSTACK_API_KEY = original_key
+@_router
+async def test_concurrent_misses_share_one_upstream_fetch(client):
+    route = _weatherstack.mock(
+        return_value=httpx.Response(200, content=SUCCESS_BODY, headers=_JSON_HEADERS)
+    )
+
+    responses = await asyncio.gather(
+        *(client.get("/weather", params={"location": "Austin"}) for _ in range(5))
+    )
 
-    assert captured_request is not None
-    query_params = dict(httpx.URL(str(captured_request.url)).params)
-    assert query_params.get("units") == "f"
+    assert [r.status_code for r in responses] == [200] * 5
+    assert route.call_count == 1
 
 
-@respx.mock
-def test_timeout_returns_502():
-    respx.get(server.WEATHERSTACK_BASE_URL).mock(
+@_router
+async def test_timeout_returns_502(client):
+    _weatherstack.mock(
         side_effect=httpx.TimeoutException("timed out")
     )
 
-    original_key = server.WEATHERSTACK_API_KEY
-    server.WEATHERSTACK_API_KEY = "test_key"
-    try:
-        response = client.get("/weather", params={"location": "Austin"})
-    finally:
-        server.WEATHERSTACK_API_KEY = original_key
+    response = await client.get("/weather", params={"location": "Austin"})
 
     assert response.status_code == 502
-    assert "error" in response.json()
+    assert "error" in _json(response)